@@ -18,30 +18,101 @@
 ############################################################################
 
 ################################
+from __future__ import annotations
 import sys
 import os
 import argparse
 import logging
+import mmap
+import re
+import stat
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Callable, Iterable, Iterator
 ################################
 
+# Write buffer for the output file; amortizes write syscalls
+OUTPUT_BUFFER_SIZE = 1 << 16
+
+# Characters trimmed around a block header such as "if x {"
+_TAIL = b" \t{"
+
+# One pattern for every statement form, so each line is matched in a
+# single scan. Source lines are matched as bytes, so they are never
+# decoded and the output never re-encoded. The outermost named group of
+# the branch that matched (match.lastgroup) selects the handler in
+# _HANDLERS. Fields are captured greedily and trimmed by the handlers,
+# which keeps every branch linear in the length of the line.
+_STATEMENT_RE = re.compile(rb"""
+    list\ (?P<list>(?P<list_name>[^=]*)=(?P<list_items>.*))
+  | class\ (?P<class>.*)
+  | method\ (?P<method>.*)
+  | print\ (?P<print>.*)
+  | if\ (?P<if>.*)
+  | while\ (?P<while>.*)
+  | for\ (?P<for>.*?in\ range\(.*)
+  | (?P<invalid>(?:list|for)\ .*)
+""", re.VERBOSE)
+
+# Assembly templates for statements, filled in with %-formatting
+_LIST_TMPL = b"%b: .data %b\n"
+_CLASS_TMPL = b"; Start of class %b\n"
+_METHOD_TMPL = b"; Start of method %b\n"
+_PRINT_TMPL = b"mov $1, %%rax\nmov $1, %%rdi\nlea %b, %%rsi\nsyscall\n"
+_IF_TMPL = b"cmp %b, 0\nje else_%d\n"
+_WHILE_TMPL = b"while_%d:\ncmp %b, 0\nje end_while_%d\n"
+_FOR_TMPL = b"mov %b, %%%b\nfor_%d:\ncmp %%%b, %b\njge end_for_%d\n"
+_UNRECOGNIZED_TMPL = b"; %b (unrecognized syntax)\n"
+
+def _mmap_lines(f: BinaryIO) -> Iterator[bytes]:
+    """
+    Yield the lines of a source file opened in binary mode. Regular,
+    non-empty files are read from a read-only memory map of them; pipes
+    and other files that cannot be mapped are read from f directly.
+    Lines may keep their line ending.
+    """
+    st = os.fstat(f.fileno())
+    if stat.S_ISREG(st.st_mode) and st.st_size > 0:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            pass
+        else:
+            with mm:
+                # readline splits on LF only; any CR (CRLF, bare CR or a mix
+                # of endings) needs the universal-newline split of splitlines()
+                if mm.find(b"\r") >= 0:
+                    yield from mm[:].splitlines()
+                else:
+                    yield from iter(mm.readline, b"")
+            return
+
+    # Iterating f splits on LF only, so split each line again for bare CRs
+    for line in f:
+        yield from line.splitlines()
+
+def _init_worker(level: int) -> None:
+    """
+    Configure logging in a compile_many worker process.
+    """
+    logging.basicConfig(level=level)
+
+def _compile_one(pair: tuple[str, str]) -> bool:
+    """
+    Compile one (input, output) pair with a fresh compiler, so no block
+    stack or label numbering is shared between files.
+    """
+    return KalaCompiler().compile(*pair)
+
 class KalaCompiler:
-    def __init__(self):
-        self.block_stack = []  # Stack to manage nested blocks
+    def __init__(self) -> None:
+        # Stack of (kind, name) for nested blocks
+        self.block_stack: list[tuple[str, bytes | int]] = []
+        self.label_count: int = 0  # Next number for unique control-flow labels
 
-    def compile(self, input_file, output_file):
+    def compile(self, input_file: str, output_file: str) -> bool:
         """
         Compile a .kala file into assembly (.s).
         """
-        # Check if the input file exists
-        if not os.path.exists(input_file):
-            logging.error("Input file does not exist.")
-            return False
-
-        # Check if the output file exists
-        if os.path.exists(output_file):
-            logging.error("Output file already exists.")
-            return False
-
         # Ensure the input file has a .kala extension
         if not input_file.endswith(".kala"):
             logging.error("Input file must have a .kala extension.")
@@ -52,201 +123,232 @@ class KalaCompiler:
             logging.error("Output file must have a .s extension.")
             return False
 
-        # Read and parse the input file
+        # Open the input first so a missing source never creates an output
         try:
-            with open(input_file, "r") as f:
-                code = f.read()
-
-            # Transform Kala syntax to assembly code
-            asm_code = self.parse_kala_code(code)
-
-            # Write the assembly code to the output file
-            with open(output_file, "w") as f:
-                f.write(asm_code)
-
-        except Exception as e:
-            logging.error(f"Error during compilation: {e}")
+            src = open(input_file, "rb")
+        except FileNotFoundError:
+            logging.error("Input file does not exist.")
+            return False
+        except OSError as e:
+            logging.error("Error during compilation: %s", e)
             return False
 
+        with src:
+            # Create the output exclusively; never overwrite an existing file
+            try:
+                dst = open(output_file, "xb", buffering=OUTPUT_BUFFER_SIZE)
+            except FileExistsError:
+                logging.error("Output file already exists.")
+                return False
+            except OSError as e:
+                logging.error("Error during compilation: %s", e)
+                return False
+
+            # Stream Kala syntax in and assembly code out line by line
+            try:
+                with dst:
+                    self.parse_kala_code(_mmap_lines(src), dst)
+
+            except Exception as e:
+                logging.error("Error during compilation: %s", e)
+                # Do not leave a partial output file behind
+                os.remove(output_file)
+                return False
+
         logging.info("Compilation successful.")
         return True
 
-    def parse_kala_code(self, code):
+    def compile_many(self, pairs: list[tuple[str, str]],
+                     workers: int | None = None) -> bool:
+        """
+        Compile several (input .kala, output .s) pairs, fanning them out
+        over a process pool. Returns True only if every file compiled.
+        """
+        if len(pairs) <= 1 or workers == 1:
+            return all([_compile_one(pair) for pair in pairs])
+
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(logging.getLogger().level,)) as pool:
+            return all(pool.map(_compile_one, pairs))
+
+    def parse_kala_code(self, lines: Iterable[bytes], out: BinaryIO) -> None:
         """
         Transform Kala syntax into assembly code.
+        Reads any iterable of source lines as bytes, such as a file opened
+        in binary mode, and writes the assembly to the binary file-like
+        object out.
         """
-        asm_code = ""  # Assembly output
+        write = out.write
 
-        for line in code.splitlines():
+        for line in lines:
+            # The only whitespace pass per line; handlers work on this text
             line = line.strip()
+            first = line[:1]
 
             # Skip comments
-            if line.startswith("#"):
+            if first == b"#":
                 continue
 
-            # Parse Kala-specific syntax
-            if line.startswith("list "):
-                # Handle lists
-                name, elements = self.parse_list_declaration(line)
-                asm_code += f"{name}: .data {', '.join(elements)}\n"
-
-            elif line.startswith("class "):
-                # Handle class declarations
-                asm_code += self.parse_class(line)
-
-            elif line.startswith("method "):
-                # Handle methods
-                asm_code += self.parse_method(line)
-
-            elif line.startswith("print "):
-                # Handle print statements
-                asm_code += self.parse_print(line)
-
-            elif line.startswith("if "):
-                # Handle if statements
-                asm_code += self.parse_if(line)
-
-            elif line.startswith("while "):
-                # Handle while loops
-                asm_code += self.parse_while(line)
-
-            elif line.startswith("for "):
-                # Handle for loops
-                asm_code += self.parse_for(line)
-
-            elif line == "}":
+            if line == b"}":
                 # Handle block closure
-                asm_code += self.parse_block_close()
+                write(self.parse_block_close())
+                continue
 
+            # Dispatch Kala-specific syntax on the statement form that matched
+            match = _STATEMENT_RE.fullmatch(line)
+            if match is not None and match.lastgroup is not None:
+                write(_HANDLERS[match.lastgroup](self, match))
             else:
                 # Default case: emit raw assembly
-                asm_code += f"; {line} (unrecognized syntax)\n"
+                write(_UNRECOGNIZED_TMPL % line)
 
-        return asm_code
-
-    def parse_list_declaration(self, line):
+    def parse_list(self, match: re.Match[bytes]) -> bytes:
         """
         Parse a Kala list declaration.
         Syntax: list list_name = [element1, element2, ...]
         """
-        try:
-            _, rest = line.split("list ", 1)
-            name, elements = rest.split("=", 1)
-            name = name.strip()
-            elements = elements.strip().strip("[]").split(",")
-            elements = [elem.strip() for elem in elements]
-            return name, elements
-        except Exception as e:
-            logging.error(f"Error parsing list declaration: {e}")
-            return None, []
-
-    def parse_class(self, line):
+        name, body = match.group("list_name", "list_items")
+        elements = body.strip().strip(b"[]").split(b",")
+        elements = [elem.strip() for elem in elements]
+        return _LIST_TMPL % (name.strip(), b", ".join(elements))
+
+    def parse_class(self, match: re.Match[bytes]) -> bytes:
         """
         Parse a Kala class declaration.
         Syntax: class ClassName { ... }
         """
-        class_name = line.split("class ", 1)[1].strip(" {")
-        self.block_stack.append(f"class_{class_name}")
-        return f"; Start of class {class_name}\n"
+        class_name = match.group("class").strip(_TAIL)
+        self.block_stack.append(("class", class_name))
+        return _CLASS_TMPL % class_name
 
-    def parse_method(self, line):
+    def parse_method(self, match: re.Match[bytes]) -> bytes:
         """
         Parse a Kala method declaration.
         Syntax: method MethodName { ... }
         """
-        method_name = line.split("method ", 1)[1].strip(" {")
-        self.block_stack.append(f"method_{method_name}")
-        return f"; Start of method {method_name}\n"
+        method_name = match.group("method").strip(_TAIL)
+        self.block_stack.append(("method", method_name))
+        return _METHOD_TMPL % method_name
 
-    def parse_print(self, line):
+    def parse_print(self, match: re.Match[bytes]) -> bytes:
         """
         Parse a Kala print statement.
         Syntax: print "message"
         """
-        try:
-            _, message = line.split("print ", 1)
-            message = message.strip("\"")
-            return f"mov $1, %rax\nmov $1, %rdi\nlea {message}, %rsi\nsyscall\n"
-        except Exception as e:
-            logging.error(f"Error parsing print statement: {e}")
-            return ""
+        message = match.group("print").strip(b'"')
+        return _PRINT_TMPL % message
 
-    def parse_if(self, line):
+    def parse_if(self, match: re.Match[bytes]) -> bytes:
         """
         Parse a Kala if statement.
         Syntax: if condition { ... }
         """
-        try:
-            condition = line.split("if ", 1)[1].strip(" {")
-            self.block_stack.append("if")
-            return f"cmp {condition}, 0\nje else_label\n"
-        except Exception as e:
-            logging.error(f"Error parsing if statement: {e}")
-            return ""
+        condition = match.group("if").strip(_TAIL)
+        n = self.next_label()
+        self.block_stack.append(("if", n))
+        return _IF_TMPL % (condition, n)
 
-    def parse_while(self, line):
+    def parse_while(self, match: re.Match[bytes]) -> bytes:
         """
         Parse a Kala while loop.
         Syntax: while condition { ... }
         """
-        try:
-            condition = line.split("while ", 1)[1].strip(" {")
-            self.block_stack.append("while")
-            return f"while_label:\ncmp {condition}, 0\nje end_while_label\n"
-        except Exception as e:
-            logging.error(f"Error parsing while loop: {e}")
-            return ""
+        condition = match.group("while").strip(_TAIL)
+        n = self.next_label()
+        self.block_stack.append(("while", n))
+        return _WHILE_TMPL % (n, condition, n)
 
-    def parse_for(self, line):
+    def parse_for(self, match: re.Match[bytes]) -> bytes:
         """
         Parse a Kala for loop.
         Syntax: for var in range(start, end) { ... }
         """
-        try:
-            _, rest = line.split("for ", 1)
-            var, range_part = rest.split("in range(", 1)
-            start, end = range_part.strip("){} ").split(",")
-            var = var.strip()
-            self.block_stack.append("for")
-            return (f"mov {start}, %{var}\nfor_label:\ncmp %{var}, {end}\n"
-                    f"jge end_for_label\n")
-        except Exception as e:
-            logging.error(f"Error parsing for loop: {e}")
-            return ""
-
-    def parse_block_close(self):
+        var, _, range_part = match.group("for").partition(b"in range(")
+        bounds = range_part.strip(b"){} ").split(b",")
+        if len(bounds) != 2:
+            return self.parse_invalid(match)
+
+        start, end = bounds
+        var = var.strip()
+        n = self.next_label()
+        self.block_stack.append(("for", n))
+        return _FOR_TMPL % (start, var, n, var, end, n)
+
+    def parse_invalid(self, match: re.Match[bytes]) -> bytes:
+        """
+        Report a list or for statement whose syntax could not be parsed.
+        """
+        keyword = match.group(0).partition(b" ")[0]
+        logging.error("Error parsing %s statement: %s",
+                      keyword.decode("utf-8", "replace"),
+                      match.group(0).decode("utf-8", "replace"))
+        return b""
+
+    def parse_block_close(self) -> bytes:
         """
         Handle closing of a block (}).
         """
         if not self.block_stack:
             logging.error("Mismatched block closure detected.")
-            return ""
-
-        block_type = self.block_stack.pop()
-        if block_type.startswith("class_"):
-            return f"; End of class {block_type.split('_', 1)[1]}\n"
-        elif block_type.startswith("method_"):
-            return f"; End of method {block_type.split('_', 1)[1]}\n"
-        elif block_type == "if":
-            return "else_label:\n"
-        elif block_type == "while":
-            return "jmp while_label\nend_while_label:\n"
-        elif block_type == "for":
-            return "jmp for_label\nend_for_label:\n"
-
-        return ""
+            return b""
+
+        kind, name = self.block_stack.pop()
+        return _CLOSE[kind] % {b"n": name}
+
+    def next_label(self) -> int:
+        """
+        Reserve a label number unique within this compiler instance.
+        """
+        n = self.label_count
+        self.label_count += 1
+        return n
+
+# Assembly emitted when a block is closed, by block name or label number
+_CLOSE = {
+    "class": b"; End of class %(n)b\n",
+    "method": b"; End of method %(n)b\n",
+    "if": b"else_%(n)d:\n",
+    "while": b"jmp while_%(n)d\nend_while_%(n)d:\n",
+    "for": b"jmp for_%(n)d\nend_for_%(n)d:\n",
+}
+
+# Statement handlers keyed by the _STATEMENT_RE group that matched
+_HANDLERS: dict[str, Callable[[KalaCompiler, re.Match[bytes]], bytes]] = {
+    "list": KalaCompiler.parse_list,
+    "class": KalaCompiler.parse_class,
+    "method": KalaCompiler.parse_method,
+    "print": KalaCompiler.parse_print,
+    "if": KalaCompiler.parse_if,
+    "while": KalaCompiler.parse_while,
+    "for": KalaCompiler.parse_for,
+    "invalid": KalaCompiler.parse_invalid,
+}
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Kala Compiler")
     parser.add_argument("input_file", help="Path to the .kala source file")
     parser.add_argument("output_file", help="Path to the output .s file")
+    parser.add_argument("more_files", nargs="*",
+                        metavar="input_file output_file",
+                        help="Further .kala/.s pairs to compile")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Number of worker processes for multiple files "
+                             "(default: one per CPU)")
 
     args = parser.parse_args()
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if len(args.more_files) % 2:
+        parser.error("input and output files must be given in pairs")
+
+    files = [args.input_file, args.output_file] + args.more_files
+    pairs = list(zip(files[::2], files[1::2]))
 
     logging.basicConfig(level=logging.INFO)
 
     compiler = KalaCompiler()
-    if compiler.compile(args.input_file, args.output_file):
+    if compiler.compile_many(pairs, args.jobs):
         logging.info("Compilation completed successfully.")
     else:
         logging.error("Compilation failed.")
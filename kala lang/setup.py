@@ -0,0 +1,88 @@
+############################################################################
+#
+# This file is part of the Kalalang compiler.
+#
+# The Kalalang compiler is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version.
+#
+# The Kalalang compiler is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# the Kalalang compiler.  If not, see <http://www.gnu.org/licenses/>.
+#
+############################################################################
+
+################################
+import os
+import logging
+from setuptools import setup
+from setuptools.command.build_ext import build_ext
+################################
+
+class OptionalBuildExt(build_ext):
+    """
+    Build the compiled extension, falling back to the pure-Python module
+    when no C toolchain is available.
+    """
+    def run(self):
+        try:
+            build_ext.run(self)
+        except Exception as e:
+            logging.warning("Skipping extension build: %s", e)
+
+    def build_extension(self, ext):
+        try:
+            build_ext.build_extension(self, ext)
+        except Exception as e:
+            logging.warning("Skipping extension build of %s: %s", ext.name, e)
+
+def _enabled(name, default):
+    """
+    Read a boolean build switch from the environment.
+    """
+    return os.environ.get(name, default).lower() not in ("false", "0", "no")
+
+def mypyc_extensions():
+    """
+    Compile kalalang.py ahead of time with mypyc when KALA_MYPYC=True and
+    mypy is available.
+    """
+    if not _enabled("KALA_MYPYC", "False"):
+        return []
+
+    try:
+        from mypyc.build import mypycify
+    except ImportError:
+        return []
+
+    return mypycify(["kalalang.py"])
+
+def cython_extensions():
+    """
+    Compile kalalang.py ahead of time with Cython when it is available.
+    Set KALA_CYTHON=False to force a pure-Python install.
+    """
+    if not _enabled("KALA_CYTHON", "True"):
+        return []
+
+    try:
+        from Cython.Build import cythonize
+    except ImportError:
+        return []
+
+    return cythonize(["kalalang.py"], language_level=3)
+
+setup(
+    name="kalalang",
+    version="0.1.0",
+    description="Kala Compiler",
+    license="GPLv3",
+    py_modules=["kalalang"],
+    ext_modules=mypyc_extensions() or cython_extensions(),
+    cmdclass={"build_ext": OptionalBuildExt},
+)
@@ -7,28 +7,28 @@ lea Welcome to Kala Language!, %rsi
 syscall
 ;  (unrecognized syntax)
 cmp myList[0] == 1, 0
-je else_label
+je else_0
 mov $1, %rax
 mov $1, %rdi
 lea First element is 1, %rsi
 syscall
-else_label:
+else_0:
 ;  (unrecognized syntax)
-while_label:
+while_1:
 cmp myList[0] < 10, 0
-je end_while_label
+je end_while_1
 mov $1, %rax
 mov $1, %rdi
 lea Incrementing first element, %rsi
 syscall
 ; myList[0] = myList[0] + 1 (unrecognized syntax)
-jmp while_label
-end_while_label:
+jmp while_1
+end_while_1:
 ;  (unrecognized syntax)
 mov 0, %i
-for_label:
+for_2:
 cmp %i,  5
-jge end_for_label
+jge end_for_2
 mov $1, %rax
 mov $1, %rdi
 lea Index: , %rsi
@@ -37,8 +37,8 @@ mov $1, %rax
 mov $1, %rdi
 lea i, %rsi
 syscall
-jmp for_label
-end_for_label:
+jmp for_2
+end_for_2:
 ;  (unrecognized syntax)
 ; Start of class MyClass
 ; Start of method greet()
@@ -51,3 +51,16 @@ syscall
 ;  (unrecognized syntax)
 ; MyClass instance (unrecognized syntax)
 ; instance.greet() (unrecognized syntax)
+;  (unrecognized syntax)
+mov $1, %rax
+mov $1, %rdi
+lea CR line, %rsi
+syscall
+mov $1, %rax
+mov $1, %rdi
+lea LF line, %rsi
+syscall
+mov $1, %rax
+mov $1, %rdi
+lea CRLF line, %rsi
+syscall